@@ -19,6 +19,7 @@ import pandas as pd
 import duckdb
 import arcpy
 from functions.utils import get_bbox_coords, get_overture_bldgs
+from functions.utils import quantize_geoms, add_inner_geom, get_db_size, compare_queries
 from functions.arcpy_utils import check_repair_fc
 
 pd.set_option("display.max_rows", 500)
@@ -221,8 +222,11 @@ con.sql("""
 # "distinct on" in the final select statement limits the results to
 # one row for each distinct value of FHSZ_Descr
 
-con.sql("""
-        create or replace table fhsz_near_dist as
+# note_3:
+# the query is kept as a template so it can be rerun
+# against the compacted LRA table further down
+
+near_dist_sql = """
         with cte0 as (
             select
                 ST_AsText(ST_Point(-122.708061, 38.365655)) as home_wkt,
@@ -240,7 +244,7 @@ con.sql("""
                 round(ST_Distance(home_pt_3310, geom_3310)::numeric, 2) as dist_m,
                 round(dist_m * 0.0006213712, 2) as dist_mi,
                 ST_ShortestLine(home_pt_3310, geom_3310) as line_geom
-            from fhsz_lra, cte0
+            from {tbl_lra}, cte0
             where 1=1
             and ST_DWithin(home_pt_3310, geom_3310, 15000) -- 10 miles
             and FHSZ_Descr in ('Moderate', 'High', 'Very High')
@@ -254,7 +258,97 @@ con.sql("""
             line_geom
         from cte1
         order by dist_m
-""")        # 0s
+"""
+
+con.sql(f"""
+        create or replace table fhsz_near_dist as
+        {near_dist_sql.format(tbl_lra="fhsz_lra")}
+        """)        # 0s
+
+
+# -----------------------
+# compact FHSZ geometry storage
+
+# note_1:
+# fhsz_sra & fhsz_lra store every polygon twice (geom_3310 + geom_4326).
+# the compact tables keep only geom_3310, snapped to 1cm;
+# the centroid joins transform one point per hex to 3310 instead,
+# and geom_4326 is produced on the fly by the *_4326 views for viewing
+
+# note_2:
+# geom_3310_inner is a simplified copy shrunk inside each polygon,
+# so centroids inside it skip the exact ST_Intersects,
+# only centroids near (or outside) the boundary get the exact test
+
+# note_3:
+# the compact tables are built next to the originals and only swapped in
+# once they reproduce the full-precision answers from above
+
+grid_3310 = 0.01            # metres
+simp_tol_3310 = 10          # metres
+
+get_db_size(con)            # MiB before
+
+for tbl in ["fhsz_sra", "fhsz_lra"]:
+    quantize_geoms(con, tbl, f"{tbl}_compact", {"geom_3310": grid_3310}, drop_cols=["geom_4326"])
+    add_inner_geom(con, f"{tbl}_compact", "geom_3310", simp_tol_3310)
+
+# check the compact centroid joins against the full-precision joins, and time both
+for tbl, descr in [("fhsz_sra", "FHSZ_Description"), ("fhsz_lra", "FHSZ_Descr")]:
+    rows_match = compare_queries(
+        con,
+        f"""
+        select t1.hexid_8, t2.{descr}
+        from h3_8_sonoma t1, {tbl} t2
+        where ST_Intersects(ST_Centroid(t1.geom), t2.geom_4326)
+        """,
+        f"""
+        with cte as (
+            select
+                hexid_8,
+                ST_Transform(ST_Centroid(geom), 'EPSG:4326', 'EPSG:3310', always_xy := true) as pt_3310
+            from h3_8_sonoma
+        )
+        select t1.hexid_8, t2.{descr}
+        from cte t1, {tbl}_compact t2
+        where ST_Intersects(t1.pt_3310, t2.geom_3310_inner)
+        or ST_Intersects(t1.pt_3310, t2.geom_3310)
+        """)
+    if not rows_match:
+        raise ValueError(f"{tbl}_compact: centroid join doesn't match full precision")
+
+# check fhsz_near_dist against the compact LRA:
+# dist_m & dist_mi are rounded to 0.01, and snapping moves the polygon
+# by up to ~0.007m, so the rounded values may move by one 0.01 step
+rows_match = compare_queries(
+    con,
+    f"""
+    select FHSZ_Descr, dist_m, dist_mi
+    from ({near_dist_sql.format(tbl_lra="fhsz_lra")})
+    """,
+    f"""
+    select FHSZ_Descr, dist_m, dist_mi
+    from ({near_dist_sql.format(tbl_lra="fhsz_lra_compact")})
+    """,
+    tol=0.011)
+if not rows_match:
+    raise ValueError("fhsz_lra_compact: fhsz_near_dist doesn't match full precision")
+
+# swap the compact tables in
+for tbl in ["fhsz_sra", "fhsz_lra"]:
+    con.sql(f"""
+            drop table {tbl};
+
+            alter table {tbl}_compact rename to {tbl};
+
+            create or replace view {tbl}_4326 as
+            select
+                * exclude (geom_3310, geom_3310_inner),
+                ST_Transform(geom_3310, 'EPSG:3310', 'EPSG:4326', always_xy := true) as geom_4326
+            from {tbl};
+            """)
+
+get_db_size(con)            # MiB after
 
 
 # -----------------------
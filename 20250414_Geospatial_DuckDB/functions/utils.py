@@ -1,3 +1,4 @@
+import time
 import duckdb
 from duckdb import DuckDBPyConnection
 
@@ -91,3 +92,137 @@ def get_overture_bldgs(con: DuckDBPyConnection,
             """)
 
     print(f"{tbl_name=} created.")
+
+
+def quantize_geoms(con: DuckDBPyConnection,
+                   tbl_name: str,
+                   new_tbl_name: str,
+                   grid_sizes: dict,
+                   drop_cols: list = None
+                   ) -> None:
+    """
+    creates new_tbl_name from tbl_name with geometry coordinates snapped to a
+    fixed precision grid, e.g. {"geom_3310": 0.01} = centimetres in 3310
+    grid size is in the units of each column's CRS (metres, degrees)
+    drop_cols are left out of the new table (e.g. a duplicate geom in another CRS)
+    geometries are made valid first, since the precision reducer can throw on
+    invalid input; if snapping collapses a geometry to EMPTY the valid
+    full-precision geometry is kept instead, so no feature is lost
+    tbl_name is left untouched, swap the new table in once it's been checked
+    note: DuckDB stores each coordinate as a double whatever its precision,
+    so snapping alone saves little, dropping duplicate geom columns is what shrinks
+    """
+    replace_cols = ", ".join(
+        f"""
+        case
+            when ST_IsEmpty(ST_ReducePrecision(ST_MakeValid({col}), {grid}))
+            then ST_MakeValid({col})
+            else ST_ReducePrecision(ST_MakeValid({col}), {grid})
+        end as {col}
+        """
+        for col, grid in grid_sizes.items()
+    )
+    exclude_cols = f"exclude ({', '.join(drop_cols)})" if drop_cols else ""
+
+    con.sql(f"""
+            create or replace table {new_tbl_name} as
+            select * {exclude_cols} replace ({replace_cols})
+            from {tbl_name}
+            """)
+
+    print(f"{new_tbl_name=} quantized from {tbl_name=}.")
+
+
+def add_inner_geom(con: DuckDBPyConnection,
+                   tbl_name: str,
+                   geom_col: str,
+                   tolerance: float
+                   ) -> None:
+    """
+    adds {geom_col}_inner: geom_col simplified at tolerance, then shrunk by 2 * tolerance,
+    so it always lies inside geom_col. tolerance is in the units of geom_col's CRS.
+    used as a fast path for point-in-polygon joins:
+        point inside _inner  -> inside geom_col, no exact check
+        otherwise            -> exact ST_Intersects on geom_col
+    the 2x margin covers the simplify error + the buffer's arc approximation,
+    and one segment per quarter circle keeps the vertex count down.
+    """
+    con.sql(f"""
+            alter table {tbl_name}
+            add column if not exists {geom_col}_inner geometry
+            """)
+
+    con.sql(f"""
+            update {tbl_name}
+            set {geom_col}_inner = ST_Buffer(ST_SimplifyPreserveTopology({geom_col}, {tolerance}), -2 * {tolerance}, 1)
+            """)
+
+    print(f"{tbl_name=} {geom_col}_inner added at {tolerance=}.")
+
+
+def get_db_size(con: DuckDBPyConnection) -> float:
+    """
+    checkpoints the database and returns the MiB in use,
+    free blocks left behind by dropped tables aren't counted
+    """
+    con.execute("checkpoint")
+    used_blocks, block_size = con.sql("""
+                                      select used_blocks, block_size
+                                      from pragma_database_size()
+                                      """).fetchone()
+    return round(used_blocks * block_size / 2**20, 1)
+
+
+def _rows_match(rows_a: list, rows_b: list, tol: float) -> bool:
+    """
+    True if both row lists hold the same rows (in any order),
+    float values may differ by up to tol
+    """
+    if len(rows_a) != len(rows_b):
+        return False
+
+    def sort_key(row):
+        return [str(v) for v in row if not isinstance(v, float)]
+
+    for row_a, row_b in zip(sorted(rows_a, key=sort_key), sorted(rows_b, key=sort_key)):
+        for a, b in zip(row_a, row_b):
+            if isinstance(a, float) and isinstance(b, float):
+                if abs(a - b) > tol:
+                    return False
+            elif a != b:
+                return False
+    return True
+
+
+def compare_queries(con: DuckDBPyConnection,
+                    sql_exact: str,
+                    sql_fast: str,
+                    tol: float = 0.0,
+                    runs: int = 3
+                    ) -> bool:
+    """
+    runs the full-precision query and its compacted/prefiltered version,
+    prints the best time of each over `runs` (after one warm-up run each) + speedup,
+    returns True if both queries return the same rows,
+    float values may differ by up to tol
+    """
+    rows_exact = con.sql(sql_exact).fetchall()
+    rows_fast = con.sql(sql_fast).fetchall()
+
+    secs_exact = []
+    secs_fast = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        con.sql(sql_exact).fetchall()
+        secs_exact.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        con.sql(sql_fast).fetchall()
+        secs_fast.append(time.perf_counter() - start)
+
+    rows_match = _rows_match(rows_exact, rows_fast, tol)
+
+    print(f"exact: {min(secs_exact):.2f}s, prefiltered: {min(secs_fast):.2f}s, "
+          f"speedup: {min(secs_exact) / max(min(secs_fast), 1e-9):.1f}x, {rows_match=}")
+
+    return rows_match